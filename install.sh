@@ -126,6 +126,10 @@ python -m pip install torch==2.8.0 torchaudio==2.8.0
 echo "Installing sounddevice..."
 python -m pip install sounddevice
 
+# Install crc32c used by export_and_test.py for model fingerprints
+echo "Installing crc32c..."
+python -m pip install crc32c
+
 # Download checkpoint file from Hugging Face
 CHECKPOINT_DIR="src/piper/lightning_logs/version_0/checkpoints"
 mkdir -p "$CHECKPOINT_DIR"
@@ -1,7 +1,17 @@
 import torch
 import os
+import time
+import concurrent.futures
 from pathlib import Path
 from lightning.pytorch.callbacks import Callback
+from lightning.pytorch.utilities.rank_zero import rank_zero_info, rank_zero_warn
+
+# Keys to look for when pulling audio out of step outputs / dict batches
+_OUTPUT_AUDIO_KEYS = ('audio', 'wav', 'waveform', 'audio_output', 'y_hat')
+_BATCH_AUDIO_KEYS = ('audio', 'audios', 'wav', 'waveform', 'y')
+
+# Minimum seconds between TensorBoard flushes from the writer thread
+_FLUSH_INTERVAL = 30.0
 
 
 class AudioLoggerCallback(Callback):
@@ -13,6 +23,7 @@ class AudioLoggerCallback(Callback):
         sample_rate: Audio sample rate (Piper typically uses 22050 Hz)
         max_audio_length: Maximum audio length to log in seconds
         validation_text: Optional fixed text to synthesize for consistent comparison
+        verbose: Report every successful TensorBoard log / WAV save (rank 0 only)
     """
     
     def __init__(
@@ -22,7 +33,8 @@ class AudioLoggerCallback(Callback):
         max_audio_length: float = 10.0,
         validation_text: str = None,
         save_to_disk: bool = True,
-        output_dir: str = "audio_samples"
+        output_dir: str = "audio_samples",
+        verbose: bool = False
     ):
         super().__init__()
         self.log_every_n_steps = log_every_n_steps
@@ -31,10 +43,20 @@ class AudioLoggerCallback(Callback):
         self.validation_text = validation_text
         self.save_to_disk = save_to_disk
         self.output_dir = output_dir
+        self.verbose = verbose
         
         # Create output directory if saving to disk
         if self.save_to_disk:
             Path(self.output_dir).mkdir(parents=True, exist_ok=True)
+        
+        # TensorBoard and WAV writes run on a single worker thread so the
+        # training step doesn't wait on encoding and disk I/O. One worker
+        # keeps our writes in order; Lightning still logs scalars to the same
+        # SummaryWriter from the training thread, which is fine because its
+        # event writer serializes writes with its own lock. Created per fit
+        # in on_train_start, which also keeps the callback picklable.
+        self._io_pool = None
+        self._last_flush = time.monotonic()
     
     def on_train_batch_end(
         self, 
@@ -45,93 +67,168 @@ class AudioLoggerCallback(Callback):
         batch_idx
     ):
         """Log audio during training at specified intervals"""
-        # Only log at specified intervals
-        if trainer.global_step % self.log_every_n_steps != 0:
-            return
-        
-        # Skip if this is step 0
-        if trainer.global_step == 0:
+        # Only log at specified intervals, and never at step 0
+        step = trainer.global_step
+        if step % self.log_every_n_steps or step == 0:
             return
         
         self._log_audio_sample(trainer, pl_module, batch, outputs)
     
     def _log_audio_sample(self, trainer, pl_module, batch, outputs):
         """Generate and log audio to TensorBoard"""
+        # Nowhere to send the audio, so don't extract or copy it
+        if trainer.logger is None and not self.save_to_disk:
+            return
+        
+        # Put model in eval mode once for the whole log event
+        was_training = pl_module.training
+        pl_module.eval()
         try:
-            # Put model in eval mode
-            was_training = pl_module.training
-            pl_module.eval()
-            
-            with torch.no_grad():
-                # Extract audio from outputs or batch
-                # The exact method depends on Piper's model structure
-                audio_output = self._extract_audio(outputs, batch, pl_module)
-                
-                if audio_output is None:
-                    print(f"[AudioLogger] Could not extract audio at step {trainer.global_step}")
-                    return
-                
-                # Ensure audio is on CPU
-                audio_output = audio_output.cpu()
-                
-                # Ensure correct shape: (channels, samples) or (samples,)
-                if audio_output.dim() == 1:
-                    audio_output = audio_output.unsqueeze(0)  # Add channel dimension
-                elif audio_output.dim() > 2:
-                    # If batch dimension exists, take first sample
-                    audio_output = audio_output[0]
-                
-                # Truncate if too long
-                if audio_output.shape[-1] > self.max_samples:
-                    audio_output = audio_output[..., :self.max_samples]
-                
-                # Normalize to [-1, 1] range
-                max_val = audio_output.abs().max()
-                if max_val > 0:
-                    audio_output = audio_output / max_val
-                
-                # Log to TensorBoard
-                if trainer.logger:
-                    try:
-                        trainer.logger.experiment.add_audio(
-                            'training/generated_audio',
-                            audio_output,
-                            trainer.global_step,
-                            sample_rate=self.sample_rate
-                        )
-                        print(f"[AudioLogger] Logged audio to TensorBoard at step {trainer.global_step}")
-                    except Exception as e:
-                        print(f"[AudioLogger] Failed to log to TensorBoard: {e}")
-                
-                # Save to disk as WAV file
-                if self.save_to_disk:
-                    try:
-                        import torchaudio
-                        import warnings
-                        output_path = Path(self.output_dir) / f"step_{trainer.global_step:08d}.wav"
-                        
-                        # Suppress torchaudio deprecation warnings
-                        with warnings.catch_warnings():
-                            warnings.filterwarnings('ignore', category=UserWarning, module='torchaudio')
-                            torchaudio.save(
-                                str(output_path),
-                                audio_output.cpu(),
-                                self.sample_rate
-                            )
-                        print(f"[AudioLogger] Saved audio to {output_path}")
-                    except ImportError:
-                        print(f"[AudioLogger] torchaudio not installed, skipping disk save. Install with: pip install torchaudio")
-                    except Exception as e:
-                        print(f"[AudioLogger] Failed to save audio to disk: {e}")
-            
+            with torch.inference_mode():
+                self._do_log(trainer, pl_module, batch, outputs)
+        finally:
             # Restore training mode
             if was_training:
                 pl_module.train()
-                
+    
+    def _do_log(self, trainer, pl_module, batch, outputs):
+        """Extract, normalize and queue the batch audio (model already in eval mode)"""
+        try:
+            # Extract audio from outputs or batch
+            # The exact method depends on Piper's model structure
+            audio_output = self._extract_audio(outputs, batch, pl_module)
+            
+            if audio_output is None:
+                rank_zero_warn(f"[AudioLogger] Could not extract audio at step {trainer.global_step}")
+                return
+            
+            # Ensure correct shape: (channels, samples) or (samples,)
+            if audio_output.dim() == 1:
+                audio_output = audio_output.unsqueeze(0)  # Add channel dimension
+            elif audio_output.dim() > 2:
+                # If batch dimension exists, take first sample
+                audio_output = audio_output[0]
+            
+            # Truncate if too long (still on the model's device, so only
+            # the kept samples get copied to the CPU). Slicing past the end
+            # just returns the whole tensor.
+            audio_output = audio_output[..., :self.max_samples]
+            
+            # Normalize to [-1, 1] range without a host sync on max_val.
+            # This also leaves us with a new tensor, not a view of the batch.
+            max_val = audio_output.abs().amax()
+            audio_output = torch.where(max_val > 0, audio_output / max_val, audio_output)
+            
+            # Ensure audio is on CPU
+            audio_output = audio_output.cpu()
+            
+            output_path = None
+            if self.save_to_disk:
+                output_path = Path(self.output_dir) / f"step_{trainer.global_step:08d}.wav"
+            
+            self._io_pool.submit(
+                self._write_worker,
+                trainer.logger.experiment if trainer.logger else None,
+                'training/generated_audio',
+                audio_output,
+                trainer.global_step,
+                output_path
+            )
+            
         except Exception as e:
-            print(f"[AudioLogger] Audio logging failed at step {trainer.global_step}: {e}")
             import traceback
-            traceback.print_exc()
+            rank_zero_warn(f"[AudioLogger] Audio logging failed at step {trainer.global_step}: {e}\n"
+                           f"{traceback.format_exc()}")
+    
+    def _write_worker(self, experiment, tag, audio_output, step, output_path=None):
+        """Log audio to TensorBoard and optionally save it as WAV (runs on the I/O thread)"""
+        done = []
+        
+        # Log to TensorBoard
+        if experiment is not None:
+            try:
+                experiment.add_audio(
+                    tag,
+                    audio_output,
+                    step,
+                    sample_rate=self.sample_rate
+                )
+                done.append(f"logged {tag} to TensorBoard")
+                
+                # Batch event file flushes instead of paying for one per clip
+                if time.monotonic() - self._last_flush > _FLUSH_INTERVAL:
+                    self._flush(experiment)
+            except Exception as e:
+                rank_zero_warn(f"[AudioLogger] Failed to log to TensorBoard: {e}")
+        
+        # Save to disk as WAV file
+        if output_path is not None:
+            try:
+                # Quantize once; both WAV writers take the int16 buffer as is
+                pcm = audio_output.clamp(-1.0, 1.0).mul_(32767.0).to(torch.int16)
+                self._save_wav(output_path, pcm)
+                done.append(f"saved {output_path}")
+            except ImportError:
+                rank_zero_warn(f"[AudioLogger] soundfile/torchaudio not installed, skipping disk save. Install with: pip install soundfile")
+            except Exception as e:
+                rank_zero_warn(f"[AudioLogger] Failed to save audio to disk: {e}")
+        
+        if done and self.verbose:
+            rank_zero_info(f"[AudioLogger] Step {step}: {', '.join(done)}")
+    
+    def _save_wav(self, output_path, pcm):
+        """Write a (channels, samples) int16 tensor as a 16-bit PCM WAV"""
+        try:
+            import soundfile as sf
+        except ImportError:
+            # torchaudio goes through its backend dispatcher on every call,
+            # so it is only the fallback
+            # No warnings.catch_warnings() here: it swaps the process-wide
+            # filter list and would race with the training thread
+            import torchaudio
+            
+            torchaudio.save(
+                str(output_path),
+                pcm,
+                self.sample_rate
+            )
+            return
+        
+        # soundfile wants (samples, channels)
+        sf.write(str(output_path), pcm.numpy().T, self.sample_rate, subtype='PCM_16')
+    
+    def _flush(self, experiment):
+        """Flush the TensorBoard event file (runs on the I/O thread)"""
+        try:
+            experiment.flush()
+        except Exception as e:
+            rank_zero_warn(f"[AudioLogger] Failed to flush TensorBoard: {e}")
+        self._last_flush = time.monotonic()
+    
+    def on_train_start(self, trainer, pl_module):
+        """Start the I/O worker for this fit"""
+        if self._io_pool is None:
+            self._io_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._last_flush = time.monotonic()
+    
+    def _shutdown_pool(self):
+        """Wait for queued audio writes to finish and drop the worker"""
+        if self._io_pool is not None:
+            self._io_pool.shutdown(wait=True)
+            self._io_pool = None
+    
+    def on_train_epoch_end(self, trainer, pl_module):
+        """Flush logged audio once per epoch, behind any queued writes"""
+        if trainer.logger and self._io_pool is not None:
+            self._io_pool.submit(self._flush, trainer.logger.experiment)
+    
+    def on_train_end(self, trainer, pl_module):
+        """Wait for queued audio writes to finish"""
+        self._shutdown_pool()
+    
+    def on_exception(self, trainer, pl_module, exception):
+        """Still write out whatever was queued before the failure"""
+        self._shutdown_pool()
     
     def _extract_audio(self, outputs, batch, pl_module):
         """
@@ -145,14 +242,11 @@ class AudioLoggerCallback(Callback):
         
         # Try to extract from outputs first (generated audio)
         if outputs is not None and isinstance(outputs, dict):
-            for key in ['audio', 'wav', 'waveform', 'audio_output', 'y_hat']:
-                if key in outputs and outputs[key] is not None:
-                    audio = outputs[key]
-                    if isinstance(audio, torch.Tensor):
-                        # Take first sample if it's a batch
-                        if audio.dim() > 1 and audio.shape[0] > 1:
-                            return audio[0]
-                        return audio
+            for key in _OUTPUT_AUDIO_KEYS:
+                audio = outputs.get(key)
+                if isinstance(audio, torch.Tensor):
+                    # Take first sample if it's a batch
+                    return audio[0] if audio.dim() > 1 and audio.shape[0] > 1 else audio
         
         # Fall back to ground truth audio from batch (Piper VITS format)
         if batch is not None:
@@ -173,13 +267,10 @@ class AudioLoggerCallback(Callback):
             
             # Fallback: try dict-like batch
             elif isinstance(batch, dict):
-                for key in ['audio', 'audios', 'wav', 'waveform', 'y']:
-                    if key in batch:
-                        audio = batch[key]
-                        if isinstance(audio, torch.Tensor):
-                            if audio.dim() > 1 and audio.shape[0] > 1:
-                                return audio[0]
-                            return audio
+                for key in _BATCH_AUDIO_KEYS:
+                    audio = batch.get(key)
+                    if isinstance(audio, torch.Tensor):
+                        return audio[0] if audio.dim() > 1 and audio.shape[0] > 1 else audio
             
             # Fallback: try tuple/list batch
             elif isinstance(batch, (tuple, list)) and len(batch) >= 2:
@@ -204,14 +295,16 @@ class MultiTextAudioLoggerCallback(AudioLoggerCallback):
         sample_rate: int = 22050,
         max_audio_length: float = 10.0,
         save_to_disk: bool = True,
-        output_dir: str = "audio_samples"
+        output_dir: str = "audio_samples",
+        verbose: bool = False
     ):
         super().__init__(
             log_every_n_steps=log_every_n_steps,
             sample_rate=sample_rate,
             max_audio_length=max_audio_length,
             save_to_disk=save_to_disk,
-            output_dir=output_dir
+            output_dir=output_dir,
+            verbose=verbose
         )
         
         # Default validation texts for TTS
@@ -220,49 +313,90 @@ class MultiTextAudioLoggerCallback(AudioLoggerCallback):
             "Hello, this is a test of the text to speech system.",
             "How are you doing today?"
         ]
+        
+        # torch.compile'd pl_module.synthesize, built on first use
+        self._compiled_synth = None
     
-    def _log_audio_sample(self, trainer, pl_module, batch, outputs):
-        """Log multiple audio samples for different texts"""
+    def _synthesize(self, pl_module, text):
+        """Run pl_module.synthesize through torch.compile, falling back to eager"""
+        if self._compiled_synth is None:
+            try:
+                self._compiled_synth = torch.compile(
+                    pl_module.synthesize, mode='reduce-overhead', dynamic=True
+                )
+            except Exception as e:
+                rank_zero_warn(f"[AudioLogger] torch.compile unavailable, using eager synthesize: {e}")
+                self._compiled_synth = False
+        
+        if self._compiled_synth:
+            try:
+                return self._compiled_synth(text)
+            except Exception as e:
+                # Compilation happens on the first call, so failures show up here
+                rank_zero_warn(f"[AudioLogger] Compiled synthesize failed, using eager: {e}")
+                self._compiled_synth = False
+        return pl_module.synthesize(text)
+    
+    def _synthesize_all(self, pl_module):
+        """
+        Synthesize every validation text in one padded forward pass.
+        
+        Needs a pl_module.synthesize_batch(texts) returning (audios, lengths).
+        Returns one trimmed tensor per text, or None to synthesize one at a time.
+        """
+        if not hasattr(pl_module, 'synthesize_batch'):
+            return None
+        
         try:
-            was_training = pl_module.training
-            pl_module.eval()
+            audios, lengths = pl_module.synthesize_batch(self.validation_texts)
+            if isinstance(lengths, torch.Tensor):
+                lengths = lengths.tolist()
+            return [audio[..., :length] for audio, length in zip(audios, lengths)]
+        except Exception as e:
+            rank_zero_warn(f"[AudioLogger] Batched synthesis failed, synthesizing texts one at a time: {e}")
+            return None
+    
+    def _do_log(self, trainer, pl_module, batch, outputs):
+        """Log the batch audio, then one sample per validation text"""
+        try:
+            # First, log the audio from the current batch
+            super()._do_log(trainer, pl_module, batch, outputs)
             
-            with torch.no_grad():
-                # First, log the audio from the current batch
-                super()._log_audio_sample(trainer, pl_module, batch, outputs)
-                
-                # Then, try to synthesize custom validation texts
-                # This requires knowing Piper's synthesis API
-                # Uncomment and adapt based on Piper's model structure:
-                
-                for idx, text in enumerate(self.validation_texts):
-                    try:
-                        audio = pl_module.synthesize(text)  # Adapt method name
-                        audio = audio.cpu()
-                        
-                        if audio.dim() == 1:
-                            audio = audio.unsqueeze(0)
-                        
-                        if audio.shape[-1] > self.max_samples:
-                            audio = audio[..., :self.max_samples]
-                        
-                        max_val = audio.abs().max()
-                        if max_val > 0:
-                            audio = audio / max_val
-                        
-                        if trainer.logger:
-                            trainer.logger.experiment.add_audio(
-                                f'validation/sample_{idx}',
-                                audio,
-                                trainer.global_step,
-                                sample_rate=self.sample_rate
-                            )
-                    except Exception as e:
-                        print(f"[AudioLogger] Failed to synthesize text {idx}: {e}")
+            # Validation samples only go to TensorBoard
+            if not trainer.logger:
+                return
             
-            if was_training:
-                pl_module.train()
+            # Then, try to synthesize custom validation texts
+            # This requires knowing Piper's synthesis API
+            # Uncomment and adapt based on Piper's model structure:
+            batch_audios = self._synthesize_all(pl_module)
+            
+            for idx, text in enumerate(self.validation_texts):
+                try:
+                    if batch_audios is not None:
+                        audio = batch_audios[idx]
+                    else:
+                        audio = self._synthesize(pl_module, text)
+                    
+                    if audio.dim() == 1:
+                        audio = audio.unsqueeze(0)
+                    
+                    audio = audio[..., :self.max_samples]
+                    
+                    max_val = audio.abs().amax()
+                    audio = torch.where(max_val > 0, audio / max_val, audio)
+                    audio = audio.cpu()
+                    
+                    self._io_pool.submit(
+                        self._write_worker,
+                        trainer.logger.experiment,
+                        f'validation/sample_{idx}',
+                        audio,
+                        trainer.global_step
+                    )
+                except Exception as e:
+                    rank_zero_warn(f"[AudioLogger] Failed to synthesize text {idx}: {e}")
                 
         except Exception as e:
-            print(f"[AudioLogger] Multi-text audio logging failed: {e}")
+            rank_zero_warn(f"[AudioLogger] Multi-text audio logging failed: {e}")
 
@@ -1,16 +1,35 @@
 import torch
 import pathlib
-import tkinter as tk
-from tkinter import filedialog, messagebox
+import argparse
 import os
 
+# Keep only essential architecture parameters
+_KEEP_PARAMS = frozenset({
+    'num_symbols', 'num_speakers', 'resblock', 'resblock_kernel_sizes',
+    'resblock_dilation_sizes', 'upsample_rates', 'upsample_initial_channel',
+    'upsample_kernel_sizes', 'filter_length', 'hop_length', 'win_length',
+    'mel_channels', 'mel_fmin', 'mel_fmax', 'inter_channels', 'hidden_channels',
+    'filter_channels', 'n_heads', 'n_layers', 'kernel_size', 'p_dropout',
+    'n_layers_q', 'use_spectral_norm', 'gin_channels', 'use_sdp', 'segment_size'
+})
+
 def convert_paths(obj):
-    """Recursively convert Path objects to strings"""
+    """Recursively convert Path objects to strings
+    
+    Dicts and lists are updated in place so the state_dict tensors are
+    left alone instead of being copied into a new tree.
+    """
     if isinstance(obj, pathlib.Path):
         return str(obj)
     elif isinstance(obj, dict):
-        return {k: convert_paths(v) for k, v in obj.items()}
-    elif isinstance(obj, (list, tuple)):
+        for k, v in obj.items():
+            if isinstance(v, (pathlib.Path, dict, list, tuple)):
+                obj[k] = convert_paths(v)
+    elif isinstance(obj, list):
+        for i, v in enumerate(obj):
+            if isinstance(v, (pathlib.Path, dict, list, tuple)):
+                obj[i] = convert_paths(v)
+    elif isinstance(obj, tuple):
         return type(obj)(convert_paths(item) for item in obj)
     return obj
 
@@ -24,24 +43,10 @@ def strip_checkpoint_params(checkpoint):
     for key, value in checkpoint['hyper_parameters'].items():
         print(f"  {key}: {value}")
     
-    # Keep only essential architecture parameters
-    keep_params = [
-        'num_symbols', 'num_speakers', 'resblock', 'resblock_kernel_sizes',
-        'resblock_dilation_sizes', 'upsample_rates', 'upsample_initial_channel',
-        'upsample_kernel_sizes', 'filter_length', 'hop_length', 'win_length',
-        'mel_channels', 'mel_fmin', 'mel_fmax', 'inter_channels', 'hidden_channels',
-        'filter_channels', 'n_heads', 'n_layers', 'kernel_size', 'p_dropout',
-        'n_layers_q', 'use_spectral_norm', 'gin_channels', 'use_sdp', 'segment_size'
-    ]
-    
-    keys_to_remove = [key for key in checkpoint['hyper_parameters'].keys() 
-                      if key not in keep_params]
-    
-    removed = []
-    for key in keys_to_remove:
-        if key in checkpoint['hyper_parameters']:
-            del checkpoint['hyper_parameters'][key]
-            removed.append(key)
+    removed = [key for key in checkpoint['hyper_parameters']
+               if key not in _KEEP_PARAMS]
+    for key in removed:
+        del checkpoint['hyper_parameters'][key]
     
     if removed:
         print(f"\n✓ Removed conflicting parameters: {', '.join(removed)}")
@@ -54,38 +59,15 @@ def strip_checkpoint_params(checkpoint):
     
     return checkpoint
 
-def process_checkpoint():
-    """Main processing function with file/folder pickers"""
-    # Hide the root window
-    root = tk.Tk()
-    root.withdraw()
-    
-    # Select input checkpoint file
-    print("Please select the checkpoint file to process...")
-    input_checkpoint = filedialog.askopenfilename(
-        title="Select Checkpoint File",
-        filetypes=[("Checkpoint files", "*.ckpt"), ("All files", "*.*")]
-    )
-    
-    if not input_checkpoint:
-        print("No file selected. Exiting.")
-        return
-    
-    # Select output folder
-    print("Please select the output folder...")
-    output_folder = filedialog.askdirectory(
-        title="Select Output Folder"
-    )
-    
-    if not output_folder:
-        print("No output folder selected. Exiting.")
-        return
-    
-    # Generate output filename
+def output_path_for(input_checkpoint, output_folder):
+    """Name of the processed checkpoint written for input_checkpoint"""
     input_filename = os.path.basename(input_checkpoint)
-    output_filename = f"processed-{input_filename}"
-    output_checkpoint = os.path.join(output_folder, output_filename)
-    temp_checkpoint = os.path.join(output_folder, f"temp-{input_filename}")
+    return os.path.join(output_folder, f"processed-{input_filename}")
+
+def convert(input_checkpoint, output_checkpoint):
+    """Load, convert, strip and save one checkpoint. Raises on failure."""
+    # Written under a temporary name and renamed into place once complete
+    temp_checkpoint = f"{output_checkpoint}.tmp"
     
     print(f"\n{'='*60}")
     print(f"Input file: {input_checkpoint}")
@@ -98,65 +80,110 @@ def process_checkpoint():
     try:
         # Step 1: Load and convert checkpoint
         print("Step 1: Loading checkpoint...")
-        checkpoint = torch.load(input_checkpoint, weights_only=False, map_location='cpu')
+        # mmap=True (PyTorch 2.1+) maps tensor storages from the file instead
+        # of reading them all into RAM; only the metadata gets edited here
+        checkpoint = torch.load(input_checkpoint, weights_only=False, map_location='cpu', mmap=True)
         print("✓ Checkpoint loaded successfully")
         
         print("\nStep 2: Converting path objects to strings...")
         checkpoint = convert_paths(checkpoint)
         print("✓ Path conversion complete")
         
-        # Save temporary converted checkpoint
-        print(f"\nStep 3: Saving temporary converted checkpoint...")
-        torch.save(checkpoint, temp_checkpoint)
-        print("✓ Temporary file saved")
-        
-        # Step 4: Strip parameters
-        print("\nStep 4: Stripping conflicting parameters...")
+        # Step 3: Strip parameters
+        print("\nStep 3: Stripping conflicting parameters...")
         checkpoint = strip_checkpoint_params(checkpoint)
         
-        # Restore original PosixPath
-        pathlib.PosixPath = original_posix
-        
-        # Step 5: Save final checkpoint
-        print(f"\nStep 5: Saving final processed checkpoint...")
-        torch.save(checkpoint, output_checkpoint)
+        # Step 4: Save final checkpoint
+        print(f"\nStep 4: Saving final processed checkpoint...")
+        # Default pickle protocol on purpose: tensors are already stored as
+        # separate zip records, and protocol 5 can't be read by torch.load's
+        # default weights_only=True unpickler
+        torch.save(checkpoint, temp_checkpoint)
+        os.replace(temp_checkpoint, output_checkpoint)
         print("✓ Final checkpoint saved successfully!")
         
-        # Clean up temporary file
+    except Exception:
+        # Clean up temporary file if it exists
         if os.path.exists(temp_checkpoint):
             os.remove(temp_checkpoint)
-            print("✓ Temporary file cleaned up")
+        raise
+    
+    finally:
+        # Restore original PosixPath, even on error
+        pathlib.PosixPath = original_posix
+    
+    print(f"\n{'='*60}")
+    print("✓ PROCESSING COMPLETE!")
+    print(f"Your processed checkpoint is ready at:")
+    print(f"{output_checkpoint}")
+    print(f"{'='*60}\n")
+
+def process_checkpoint():
+    """Main processing function with file/folder pickers"""
+    # Only the interactive path needs Tk (and a display)
+    import tkinter as tk
+    from tkinter import filedialog, messagebox
+    
+    # Hide the root window
+    root = tk.Tk()
+    root.withdraw()
+    
+    try:
+        # Select input checkpoint file
+        print("Please select the checkpoint file to process...")
+        input_checkpoint = filedialog.askopenfilename(
+            title="Select Checkpoint File",
+            filetypes=[("Checkpoint files", "*.ckpt"), ("All files", "*.*")]
+        )
         
-        print(f"\n{'='*60}")
-        print("✓ PROCESSING COMPLETE!")
-        print(f"Your processed checkpoint is ready at:")
-        print(f"{output_checkpoint}")
-        print(f"{'='*60}\n")
+        if not input_checkpoint:
+            print("No file selected. Exiting.")
+            return
         
-        # Show success message
-        messagebox.showinfo(
-            "Success", 
-            f"Checkpoint processed successfully!\n\nOutput saved to:\n{output_checkpoint}"
+        # Select output folder
+        print("Please select the output folder...")
+        output_folder = filedialog.askdirectory(
+            title="Select Output Folder"
         )
         
-    except Exception as e:
-        print(f"\n✗ Error: {e}")
-        import traceback
-        traceback.print_exc()
+        if not output_folder:
+            print("No output folder selected. Exiting.")
+            return
         
-        # Restore original PosixPath even on error
-        pathlib.PosixPath = original_posix
+        output_checkpoint = output_path_for(input_checkpoint, output_folder)
         
-        # Clean up temporary file if it exists
-        if os.path.exists(temp_checkpoint):
-            os.remove(temp_checkpoint)
-        
-        messagebox.showerror("Error", f"An error occurred:\n\n{str(e)}")
+        try:
+            convert(input_checkpoint, output_checkpoint)
+            
+            # Show success message
+            messagebox.showinfo(
+                "Success", 
+                f"Checkpoint processed successfully!\n\nOutput saved to:\n{output_checkpoint}"
+            )
+            
+        except Exception as e:
+            print(f"\n✗ Error: {e}")
+            import traceback
+            traceback.print_exc()
+            
+            messagebox.showerror("Error", f"An error occurred:\n\n{str(e)}")
     
     finally:
         root.destroy()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert and strip a Piper checkpoint. Opens file pickers when --input is not given."
+    )
+    parser.add_argument("--input", help="Checkpoint file to process")
+    parser.add_argument("--output-dir",
+                        help="Folder for processed-<file>.ckpt (default: the input's folder)")
+    args = parser.parse_args()
+    
     print("Checkpoint Converter & Stripper")
     print("="*60)
-    process_checkpoint()    
+    if args.input:
+        output_folder = args.output_dir or os.path.dirname(os.path.abspath(args.input))
+        convert(args.input, output_path_for(args.input, output_folder))
+    else:
+        process_checkpoint()
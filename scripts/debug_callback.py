@@ -1,34 +1,68 @@
+import os
+import sys
+import torch
 from lightning.pytorch.callbacks import Callback
 
+# Batch attribute names to look for when debugging
+_DEBUG_ATTRS = ('audio', 'wav', 'waveform', 'y', 'mel', 'text', 'phonemes',
+                'audio_norm', 'spec', 'spectrogram', 'mels')
+
 class DebugCallback(Callback):
+    def __init__(self):
+        super().__init__()
+        self._done = False
+    
     def on_train_batch_end(self, trainer, pl_module, outputs, batch, batch_idx):
-        if trainer.global_step == 20:  # Only debug at step 20
-            print("\n=== DEBUG INFO ===")
-            print(f"Batch type: {type(batch)}")
-            print(f"Batch attributes: {dir(batch)}")
-            
-            # Check common attribute names
-            for attr in ['audio', 'wav', 'waveform', 'y', 'mel', 'text', 'phonemes', 
-                        'audio_norm', 'spec', 'spectrogram', 'mels']:
-                if hasattr(batch, attr):
-                    value = getattr(batch, attr)
-                    if hasattr(value, 'shape'):
-                        print(f"  batch.{attr}: shape={value.shape}, dtype={value.dtype}")
-                    else:
-                        print(f"  batch.{attr}: type={type(value)}")
-            
-            # Try to get the actual audio from the model
-            print("\n--- Trying to generate audio ---")
-            try:
-                pl_module.eval()
-                with torch.no_grad():
-                    # Common synthesis methods
-                    for method_name in ['infer', 'synthesize', 'generate', 'forward', 'inference']:
-                        if hasattr(pl_module, method_name):
-                            print(f"Model has method: {method_name}")
+        if self._done or trainer.global_step != 20:  # Only debug once, at step 20
+            return
+        
+        # Collect all lines and write them out in one go
+        lines = []
+        add = lines.append
+        
+        # Check common attribute names
+        found = []
+        attr_lines = []
+        batch_dict = getattr(batch, '__dict__', None) or {}
+        for attr in _DEBUG_ATTRS:
+            value = batch_dict.get(attr)
+            if value is None:
+                value = getattr(batch, attr, None)
+            if value is None:
+                continue
+            found.append(attr)
+            if hasattr(value, 'shape'):
+                attr_lines.append(f"  batch.{attr}: shape={value.shape}, dtype={value.dtype}")
+            else:
+                attr_lines.append(f"  batch.{attr}: type={type(value)}")
+        
+        add("\n=== DEBUG INFO ===")
+        add(f"Batch type: {type(batch).__name__}")
+        # The full dir() listing is long, only show it when asked for
+        if os.environ.get("PIPER_DEBUG_FULL_DIR") == "1":
+            add(f"Batch attributes: {dir(batch)}")
+        else:
+            add(f"Batch attributes: {found}")
+        lines.extend(attr_lines)
+        
+        # Try to get the actual audio from the model
+        add("\n--- Trying to generate audio ---")
+        was_training = pl_module.training
+        try:
+            pl_module.eval()
+            with torch.no_grad():
+                # Common synthesis methods
+                for method_name in ['infer', 'synthesize', 'generate', 'forward', 'inference']:
+                    if hasattr(pl_module, method_name):
+                        add(f"Model has method: {method_name}")
+        except Exception as e:
+            add(f"Error: {e}")
+        finally:
+            # Only switch back if the model was training before
+            if was_training:
                 pl_module.train()
-            except Exception as e:
-                print(f"Error: {e}")
-            
-            print("=== END DEBUG ===\n")
-
+        
+        add("=== END DEBUG ===\n")
+        sys.stdout.write("\n".join(lines) + "\n")
+        sys.stdout.flush()
+        self._done = True
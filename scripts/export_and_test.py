@@ -7,9 +7,16 @@ Exports latest checkpoint, creates properly named files, and generates test audi
 import os
 import sys
 import argparse
+import concurrent.futures
+import contextlib
+import functools
 import subprocess
 import shutil
 import json
+import mmap
+import itertools
+import wave
+import zlib
 from pathlib import Path
 
 # Default paths (expanduser handles ~)
@@ -19,26 +26,60 @@ CONFIG_SOURCE = BASE_DIR / "my-training" / "config.json"
 OUTPUT_BASE = BASE_DIR / "my-model"
 DEFAULT_TEST_SENTENCE = "CQ Contest, this is Whiskey Seven India Yankee."
 
+# Phoneme counts for the TensorRT optimization profile (typical and longest sentence)
+TRT_OPT_PHONEMES = 128
+TRT_MAX_PHONEMES = 1024
+
+@functools.lru_cache(maxsize=8)
+def _scan_latest_version(logs_dir, mtime_ns):
+    """Return the highest version_N number in logs_dir, or -1 if there is none.
+    
+    mtime_ns is only part of the cache key, so an unchanged directory is not rescanned.
+    """
+    latest = -1
+    with os.scandir(logs_dir) as entries:
+        for entry in entries:
+            if entry.name.startswith("version_") and entry.is_dir(follow_symlinks=False):
+                try:
+                    version_num = int(entry.name[8:])
+                except ValueError:
+                    continue
+                if version_num > latest:
+                    latest = version_num
+    return latest
+
+def _scan_latest_checkpoint(checkpoint_dir):
+    """Return the path of the most recently modified .ckpt in checkpoint_dir, or None.
+    
+    Not cached: Lightning rewrites last.ckpt in place, which changes the file's
+    mtime but not the directory's, so a directory-keyed cache could go stale.
+    """
+    # Track the most recently modified checkpoint in a single pass
+    latest_path = None
+    latest_mtime = -1
+    with os.scandir(checkpoint_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith(".ckpt") and entry.is_file(follow_symlinks=False):
+                mtime = entry.stat().st_mtime
+                if mtime > latest_mtime:
+                    latest_mtime = mtime
+                    latest_path = entry.path
+    return latest_path
+
 def find_latest_version():
     """Find the highest version number in lightning_logs"""
-    if not LIGHTNING_LOGS.exists():
+    try:
+        mtime_ns = LIGHTNING_LOGS.stat().st_mtime_ns
+    except FileNotFoundError:
         print(f"Error: Lightning logs directory not found: {LIGHTNING_LOGS}")
         return None
     
-    versions = []
-    for item in LIGHTNING_LOGS.iterdir():
-        if item.is_dir() and item.name.startswith("version_"):
-            try:
-                version_num = int(item.name.split("_")[1])
-                versions.append(version_num)
-            except (IndexError, ValueError):
-                continue
-    
-    if not versions:
+    latest = _scan_latest_version(str(LIGHTNING_LOGS), mtime_ns)
+    
+    if latest < 0:
         print(f"Error: No version directories found in {LIGHTNING_LOGS}")
         return None
     
-    latest = max(versions)
     print(f"Found latest version: {latest}")
     return latest
 
@@ -46,22 +87,57 @@ def find_latest_checkpoint(version_num):
     """Find the most recent checkpoint in the version directory"""
     checkpoint_dir = LIGHTNING_LOGS / f"version_{version_num}" / "checkpoints"
     
-    if not checkpoint_dir.exists():
+    try:
+        latest_path = _scan_latest_checkpoint(str(checkpoint_dir))
+    except FileNotFoundError:
         print(f"Error: Checkpoint directory not found: {checkpoint_dir}")
         return None
     
-    checkpoints = list(checkpoint_dir.glob("*.ckpt"))
-    
-    if not checkpoints:
+    if latest_path is None:
         print(f"Error: No checkpoints found in {checkpoint_dir}")
         return None
     
-    # Sort by modification time, get the most recent
-    latest_checkpoint = max(checkpoints, key=lambda p: p.stat().st_mtime)
+    latest_checkpoint = Path(latest_path)
     print(f"Found latest checkpoint: {latest_checkpoint.name}")
     return latest_checkpoint
 
-def export_model(checkpoint_path, output_dir):
+def list_checkpoints(version_num):
+    """List all checkpoints in the version directory, oldest first"""
+    checkpoint_dir = LIGHTNING_LOGS / f"version_{version_num}" / "checkpoints"
+    
+    if not checkpoint_dir.exists():
+        print(f"Error: Checkpoint directory not found: {checkpoint_dir}")
+        return []
+    
+    with os.scandir(checkpoint_dir) as entries:
+        checkpoints = [(entry.stat().st_mtime, entry.path) for entry in entries
+                       if entry.name.endswith(".ckpt") and entry.is_file(follow_symlinks=False)]
+    checkpoints.sort()
+    return [Path(path) for _, path in checkpoints]
+
+def list_version_checkpoints():
+    """List (version, latest checkpoint) for every version in lightning_logs"""
+    if not LIGHTNING_LOGS.exists():
+        print(f"Error: Lightning logs directory not found: {LIGHTNING_LOGS}")
+        return []
+    
+    versions = []
+    with os.scandir(LIGHTNING_LOGS) as entries:
+        for entry in entries:
+            if entry.name.startswith("version_") and entry.is_dir(follow_symlinks=False):
+                try:
+                    versions.append(int(entry.name[8:]))
+                except ValueError:
+                    continue
+    
+    result = []
+    for version_num in sorted(versions):
+        checkpoint_path = find_latest_checkpoint(version_num)
+        if checkpoint_path is not None:
+            result.append((version_num, checkpoint_path))
+    return result
+
+def export_model(checkpoint_path, output_dir, verbose=False):
     """Export checkpoint to ONNX model"""
     print(f"\nExporting model from checkpoint...")
     print(f"  Checkpoint: {checkpoint_path}")
@@ -69,18 +145,56 @@ def export_model(checkpoint_path, output_dir):
     
     output_dir.mkdir(parents=True, exist_ok=True)
     
-    # Run piper export command (GPL version)
-    cmd = [
-        sys.executable, "-m", "piper.train.export_onnx",
+    export_args = [
         "--checkpoint", str(checkpoint_path),
         "--output-file", str(output_dir / "model.onnx")
     ]
     
+    # Run the piper exporter (GPL version) in this interpreter so torch and
+    # lightning are only imported once
+    try:
+        from piper.train import export_onnx
+    except ImportError:
+        return _export_model_subprocess(export_args, verbose)
+    
+    saved_argv = sys.argv
+    sys.argv = ["export_onnx"] + export_args
+    try:
+        if verbose:
+            export_onnx.main()
+        else:
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                export_onnx.main()
+        print("Export successful!")
+        return True
+    except SystemExit as e:
+        if e.code in (None, 0):
+            print("Export successful!")
+            return True
+        print(f"Export failed with exit code {e.code}")
+        return False
+    except Exception as e:
+        print(f"Export failed with error:")
+        print(e)
+        return False
+    finally:
+        sys.argv = saved_argv
+
+def _export_model_subprocess(export_args, verbose=False):
+    """Export by running piper.train.export_onnx in a separate Python process"""
+    cmd = [sys.executable, "-m", "piper.train.export_onnx"] + export_args
+    
     try:
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+        # Exporter output goes straight to the terminal when verbose,
+        # otherwise only stderr is kept for error reporting
+        subprocess.run(
+            cmd,
+            check=True,
+            stdout=None if verbose else subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True
+        )
         print("Export successful!")
-        if result.stdout:
-            print(result.stdout)
         return True
     except subprocess.CalledProcessError as e:
         print(f"Export failed with error:")
@@ -90,29 +204,28 @@ def export_model(checkpoint_path, output_dir):
         print("Error: piper_train.export_onnx not found. Make sure piper is installed.")
         return False
 
-def setup_model_files(output_dir, model_name, config_source):
+def setup_model_files(output_dir, stem, config_source):
     """Rename exported files and copy config to match piper's naming convention"""
-    print(f"\nSetting up model files with base name: en_US-{model_name}")
+    print(f"\nSetting up model files with base name: {stem}")
     
     # Expected files after export
     model_file = output_dir / "model.onnx"
     config_file = output_dir / "config.json"
     
     # Target names
-    target_model = output_dir / f"en_US-{model_name}.onnx"
-    target_config = output_dir / f"en_US-{model_name}.onnx.json"
+    target_model = output_dir / f"{stem}.onnx"
+    target_config = output_dir / f"{stem}.onnx.json"
     
     # Check if model was exported
     if not model_file.exists():
         print(f"Error: Exported model not found: {model_file}")
         return False
     
-    # Rename model file
+    # Rename model file (os.replace overwrites any existing target atomically)
     if target_model.exists():
-        print(f"Removing existing model: {target_model}")
-        target_model.unlink()
+        print(f"Replacing existing model: {target_model}")
     
-    shutil.move(str(model_file), str(target_model))
+    os.replace(model_file, target_model)
     print(f"✓ Created: {target_model.name}")
     
     # Copy and rename config file
@@ -121,18 +234,213 @@ def setup_model_files(output_dir, model_name, config_source):
             print(f"Removing existing config: {target_config}")
             target_config.unlink()
         
-        shutil.copy(str(config_source), str(target_config))
+        # copyfile skips the permission copy and uses the kernel fast path on Linux
+        shutil.copyfile(config_source, target_config)
         print(f"✓ Created: {target_config.name}")
     elif config_file.exists():
         # Use exported config if source not available
-        shutil.move(str(config_file), str(target_config))
+        os.replace(config_file, target_config)
         print(f"✓ Created: {target_config.name} (from export)")
     else:
         print(f"Warning: Config file not found at {config_source}")
         return False
     
+    # Record which export this config belongs to
+    fingerprint = record_fingerprint(target_model, target_config)
+    print(f"  Fingerprint: {fingerprint}")
+    
+    return True
+
+def quantize_model(output_dir, stem):
+    """Write an int8 dynamically quantized copy of the model next to the FP32 one"""
+    print(f"\nQuantizing model to int8...")
+    
+    model_file = output_dir / f"{stem}.onnx"
+    config_file = output_dir / f"{stem}.onnx.json"
+    quant_model = output_dir / f"{stem}.int8.onnx"
+    quant_config = output_dir / f"{stem}.int8.onnx.json"
+    
+    try:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+    except ImportError:
+        print("Error: onnxruntime.quantization not found. Install with: pip install onnxruntime")
+        return False
+    
+    try:
+        # Only MatMul/Gemm: quantizing the Conv layers produces ConvInteger
+        # nodes, which onnxruntime's CPU provider can't run
+        quantize_dynamic(str(model_file), str(quant_model),
+                         op_types_to_quantize=['MatMul', 'Gemm'],
+                         weight_type=QuantType.QInt8)
+    except Exception as e:
+        print(f"Quantization failed with error:")
+        print(e)
+        return False
+    
+    # Make sure piper will actually be able to load it
+    try:
+        import onnxruntime
+        onnxruntime.InferenceSession(str(quant_model), providers=["CPUExecutionProvider"])
+    except Exception as e:
+        print(f"Quantized model does not load in onnxruntime:")
+        print(e)
+        quant_model.unlink(missing_ok=True)
+        return False
+    print(f"✓ Created: {quant_model.name}")
+    
+    # piper looks for <model>.json, so the quantized model needs its own config
+    shutil.copyfile(config_file, quant_config)
+    record_fingerprint(quant_model, quant_config)
+    print(f"✓ Created: {quant_config.name}")
+    
+    return True
+
+def file_fingerprint(path):
+    """Return a fingerprint of the file contents.
+    
+    Uses CRC32C when the crc32c package is installed (install.sh adds it),
+    otherwise falls back to the stdlib CRC32. The result is prefixed with
+    the algorithm name, e.g. "crc32c:1a2b3c4d".
+    """
+    try:
+        import crc32c
+        checksum_func, algorithm = crc32c.crc32c, "crc32c"
+    except ImportError:
+        # Hardware CRC32C is unavailable, fall back to the stdlib CRC32
+        checksum_func, algorithm = zlib.crc32, "crc32"
+    
+    # Hash the mapped file directly instead of copying it through read buffers
+    checksum = 0
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    mapped.madvise(mmap.MADV_SEQUENTIAL)
+                checksum = checksum_func(mapped, checksum)
+    return f"{algorithm}:{checksum:08x}"
+
+def record_fingerprint(model_file, config_file):
+    """Store the model's fingerprint in its piper config and return it"""
+    fingerprint = file_fingerprint(model_file)
+    with open(config_file, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    config["fingerprint"] = fingerprint
+    with open(config_file, 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=4, ensure_ascii=False)
+    return fingerprint
+
+def read_fingerprint(model_file, config_file):
+    """Return the fingerprint recorded in the config, computing it if missing"""
+    try:
+        with open(config_file, 'r', encoding='utf-8') as f:
+            fingerprint = json.load(f).get("fingerprint")
+    except (OSError, ValueError):
+        fingerprint = None
+    return fingerprint or file_fingerprint(model_file)
+
+def build_trt_engine(output_dir, stem):
+    """Build an FP16 TensorRT engine from the exported model with trtexec"""
+    print(f"\nBuilding FP16 TensorRT engine...")
+    
+    model_file = output_dir / f"{stem}.onnx"
+    config_file = output_dir / f"{stem}.onnx.json"
+    engine_file = output_dir / f"{stem}.fp16.plan"
+    fingerprint_file = output_dir / f"{stem}.fp16.plan.fingerprint"
+    
+    # The exported inputs are dynamic (input is batch x phonemes), so give
+    # trtexec a profile; otherwise it pins every dynamic dimension to 1
+    fixed = "input_lengths:1,scales:3"
+    with open(config_file, 'r', encoding='utf-8') as f:
+        if json.load(f).get("num_speakers", 1) > 1:
+            fixed += ",sid:1"
+    shapes = [
+        f"--minShapes=input:1x1,{fixed}",
+        f"--optShapes=input:1x{TRT_OPT_PHONEMES},{fixed}",
+        f"--maxShapes=input:1x{TRT_MAX_PHONEMES},{fixed}",
+    ]
+    
+    # Skip the build if the engine was made from this exact model and profile
+    cache_key = " ".join([read_fingerprint(model_file, config_file)] + shapes)
+    if (engine_file.exists() and fingerprint_file.exists()
+            and fingerprint_file.read_text().strip() == cache_key):
+        print(f"✓ Engine is up to date: {engine_file.name}")
+        return True
+    
+    cmd = [
+        "trtexec",
+        f"--onnx={model_file}",
+        "--fp16",
+        *shapes,
+        f"--saveEngine={engine_file}"
+    ]
+    
+    try:
+        subprocess.run(
+            cmd,
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+    except subprocess.CalledProcessError as e:
+        print(f"Engine build failed with error:")
+        print(e.stderr)
+        return False
+    except FileNotFoundError:
+        print("Error: 'trtexec' command not found. Make sure TensorRT is installed and in PATH.")
+        return False
+    
+    fingerprint_file.write_text(cache_key + "\n")
+    print(f"✓ Created: {engine_file.name}")
     return True
 
+def _export_job(checkpoint_path, output_dir, stem, verbose, quantize=False, trt_fp16=False):
+    """Export one checkpoint, name its files and build the optional extras (runs in a worker process)"""
+    return (export_model(checkpoint_path, output_dir, verbose)
+            and setup_model_files(output_dir, stem, CONFIG_SOURCE)
+            and (not quantize or quantize_model(output_dir, stem))
+            and (not trt_fp16 or build_trt_engine(output_dir, stem)))
+
+def _init_export_worker(num_threads):
+    """Limit torch's thread pool so parallel exports don't oversubscribe the CPU"""
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(num_threads)
+
+def export_all(jobs, stem, max_workers=None, verbose=False, quantize=False, trt_fp16=False):
+    """Export several (checkpoint, output_dir) jobs in parallel worker processes.
+    
+    Returns one success flag per job.
+    """
+    if max_workers is None:
+        max_workers = min(len(jobs), os.cpu_count() or 1)
+    
+    print(f"\nExporting {len(jobs)} checkpoint(s) with {max_workers} worker(s)...")
+    
+    checkpoints = [checkpoint_path for checkpoint_path, _ in jobs]
+    output_dirs = [output_dir for _, output_dir in jobs]
+    # Each worker loads a full model, so split the cores between them
+    num_threads = max(1, (os.cpu_count() or 1) // max_workers)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers,
+                                                initializer=_init_export_worker,
+                                                initargs=(num_threads,)) as executor:
+        results = list(executor.map(_export_job, checkpoints, output_dirs,
+                                    itertools.repeat(stem),
+                                    itertools.repeat(verbose),
+                                    itertools.repeat(quantize),
+                                    itertools.repeat(trt_fp16)))
+    
+    print(f"\n{'=' * 70}")
+    print(f"Exported {sum(results)} of {len(jobs)} checkpoint(s)")
+    print(f"{'=' * 70}")
+    for (checkpoint_path, output_dir), ok in zip(jobs, results):
+        mark = "✓" if ok else "✗"
+        print(f"  {mark} {checkpoint_path.name} -> {output_dir / f'{stem}.onnx'}")
+    
+    return results
+
 def generate_test_audio(model_path, text, output_wav, **synthesis_params):
     """Generate test audio using piper"""
     print(f"\nGenerating test audio...")
@@ -158,12 +466,15 @@ def generate_test_audio(model_path, text, output_wav, **synthesis_params):
     
     try:
         # Send text to piper via stdin
-        result = subprocess.run(
+        # The audio is written to --output_file, so stdout is discarded
+        # and only stderr is collected for error reporting
+        subprocess.run(
             cmd,
             input=text,
             text=True,
             check=True,
-            capture_output=True
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE
         )
         print(f"✓ Audio generated: {output_wav}")
         return True
@@ -175,6 +486,56 @@ def generate_test_audio(model_path, text, output_wav, **synthesis_params):
         print("Error: 'piper' command not found. Make sure piper is installed and in PATH.")
         return False
 
+@functools.lru_cache(maxsize=2)
+def _load_voice(model_path, mtime_ns):
+    """Load a PiperVoice, reusing its ONNX session until the model file changes"""
+    from piper import PiperVoice
+    return PiperVoice.load(model_path)
+
+def generate_test_audios(model_path, items, **synthesis_params):
+    """Generate several test audio files, loading the voice model only once"""
+    try:
+        from piper import PiperVoice, SynthesisConfig
+    except ImportError:
+        # Fall back to one piper process per sentence
+        return all(generate_test_audio(model_path, text, output_wav, **synthesis_params)
+                   for text, output_wav in items)
+    
+    print(f"\nGenerating {len(items)} test audio file(s)...")
+    print(f"  Model: {model_path.name}")
+    
+    syn_config = SynthesisConfig()
+    if synthesis_params:
+        print(f"  Synthesis parameters:")
+        if 'length_scale' in synthesis_params:
+            syn_config.length_scale = synthesis_params['length_scale']
+            print(f"    length_scale: {synthesis_params['length_scale']}")
+        if 'noise_scale' in synthesis_params:
+            syn_config.noise_scale = synthesis_params['noise_scale']
+            print(f"    noise_scale: {synthesis_params['noise_scale']}")
+        if 'noise_w' in synthesis_params:
+            syn_config.noise_w_scale = synthesis_params['noise_w']
+            print(f"    noise_w: {synthesis_params['noise_w']}")
+    
+    try:
+        voice = _load_voice(str(model_path), model_path.stat().st_mtime_ns)
+        for text, output_wav in items:
+            print(f"  Text: {text}")
+            with wave.open(str(output_wav), "wb") as wav_file:
+                voice.synthesize_wav(text, wav_file, syn_config=syn_config)
+            print(f"✓ Audio generated: {output_wav}")
+        return True
+    except Exception as e:
+        print(f"Error generating audio:")
+        print(e)
+        return False
+
+def test_wav_paths(output_dir, name, count):
+    """test_<name>.wav, test_<name>_2.wav, ... for count test sentences"""
+    test_wavs = [output_dir / f"test_{name}.wav"]
+    test_wavs += [output_dir / f"test_{name}_{i}.wav" for i in range(2, count + 1)]
+    return test_wavs
+
 def main():
     parser = argparse.ArgumentParser(
         description='Export Piper checkpoint and generate test audio',
@@ -187,9 +548,21 @@ Examples:
   # Custom test sentence
   python export_and_test.py --name w7iy --text "Hello from my custom voice"
   
+  # Several test sentences (written to test_w7iy.wav, test_w7iy_2.wav, ...)
+  python export_and_test.py --name w7iy --text "First sentence" "Second sentence"
+  
   # With synthesis parameters (slower speech, more variation)
   python export_and_test.py --name w7iy --length_scale 1.2 --noise_scale 0.8
   
+  # Also write an int8 quantized model for CPU inference
+  python export_and_test.py --name w7iy --quantize
+  
+  # Also build an FP16 TensorRT engine (requires trtexec)
+  python export_and_test.py --name w7iy --trt-fp16
+  
+  # Export the latest checkpoint of every version in parallel
+  python export_and_test.py --name w7iy --all-versions --jobs 2
+  
   # Specify custom paths
   python export_and_test.py --name w7iy --version 3 --output /tmp/my-model
   
@@ -208,10 +581,23 @@ Synthesis Parameters:
                        help='Specific checkpoint file (default: latest in version)')
     parser.add_argument('--output', type=str, default=None,
                        help=f'Output directory (default: {OUTPUT_BASE})')
-    parser.add_argument('--text', type=str, default=DEFAULT_TEST_SENTENCE,
-                       help=f'Test sentence (default: "{DEFAULT_TEST_SENTENCE}")')
+    parser.add_argument('--text', type=str, nargs='+', default=[DEFAULT_TEST_SENTENCE],
+                       help=f'Test sentence(s) (default: "{DEFAULT_TEST_SENTENCE}")')
     parser.add_argument('--no-test', action='store_true',
                        help='Skip audio generation test')
+    parser.add_argument('--verbose', action='store_true',
+                       help='Show output from the ONNX exporter')
+    parser.add_argument('--quantize', action='store_true',
+                       help='Also write an int8 quantized model (en_US-<name>.int8.onnx)')
+    parser.add_argument('--all-versions', action='store_true',
+                       help='Export the latest checkpoint of every version into version_N subdirectories')
+    parser.add_argument('--all-checkpoints', action='store_true',
+                       help='Export every checkpoint of the version into per-checkpoint subdirectories')
+    parser.add_argument('--jobs', type=int, default=None,
+                       help='Parallel exports for --all-versions/--all-checkpoints (default: CPU count). '
+                            'Each job holds a full model in memory')
+    parser.add_argument('--trt-fp16', action='store_true',
+                       help='Also build an FP16 TensorRT engine (en_US-<name>.fp16.plan)')
     
     # Synthesis parameters
     parser.add_argument('--length_scale', type=float, default=None,
@@ -222,13 +608,32 @@ Synthesis Parameters:
                        help='Phoneme duration variation (default 0.8)')
     
     args = parser.parse_args()
+    bulk = args.all_versions or args.all_checkpoints
+    if bulk and args.checkpoint:
+        parser.error("--checkpoint cannot be combined with --all-versions/--all-checkpoints")
+    if args.all_versions and args.version is not None:
+        parser.error("--version cannot be combined with --all-versions")
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    stem = f"en_US-{args.name}"
+    
+    # Collect synthesis parameters
+    synthesis_params = {}
+    if args.length_scale is not None:
+        synthesis_params['length_scale'] = args.length_scale
+    if args.noise_scale is not None:
+        synthesis_params['noise_scale'] = args.noise_scale
+    if args.noise_w is not None:
+        synthesis_params['noise_w'] = args.noise_w
     
     print("=" * 70)
     print("Piper Model Export and Test")
     print("=" * 70)
     
     # Determine version
-    if args.version is not None:
+    if args.all_versions:
+        version_num = None
+    elif args.version is not None:
         version_num = args.version
         print(f"Using specified version: {version_num}")
     else:
@@ -236,6 +641,35 @@ Synthesis Parameters:
         if version_num is None:
             return 1
     
+    # Determine output directory
+    if args.output:
+        output_dir = Path(args.output)
+    else:
+        output_dir = OUTPUT_BASE
+    
+    # Export many checkpoints in parallel, each into its own subdirectory
+    if bulk:
+        if args.all_versions:
+            jobs = [(checkpoint_path, output_dir / f"version_{v}")
+                    for v, checkpoint_path in list_version_checkpoints()]
+        else:
+            jobs = [(checkpoint_path, output_dir / checkpoint_path.stem)
+                    for checkpoint_path in list_checkpoints(version_num)]
+        if not jobs:
+            print("Error: No checkpoints to export")
+            return 1
+        results = export_all(jobs, stem, args.jobs, args.verbose, args.quantize, args.trt_fp16)
+        
+        # Test each exported model, one after the other
+        success = all(results)
+        if not args.no_test:
+            for (_, job_dir), ok in zip(jobs, results):
+                if ok:
+                    items = list(zip(args.text, test_wav_paths(job_dir, args.name, len(args.text))))
+                    if not generate_test_audios(job_dir / f"{stem}.onnx", items, **synthesis_params):
+                        success = False
+        return 0 if success else 1
+    
     # Determine checkpoint
     if args.checkpoint:
         checkpoint_path = Path(args.checkpoint)
@@ -248,54 +682,55 @@ Synthesis Parameters:
         if checkpoint_path is None:
             return 1
     
-    # Determine output directory
-    if args.output:
-        output_dir = Path(args.output)
-    else:
-        output_dir = OUTPUT_BASE
-    
     # Export model
-    if not export_model(checkpoint_path, output_dir):
+    if not export_model(checkpoint_path, output_dir, args.verbose):
         return 1
     
     # Setup files with proper naming
-    if not setup_model_files(output_dir, args.name, CONFIG_SOURCE):
+    if not setup_model_files(output_dir, stem, CONFIG_SOURCE):
+        return 1
+    
+    # Optionally add an int8 model for faster CPU inference
+    if args.quantize and not quantize_model(output_dir, stem):
         return 1
     
+    # Optionally build a TensorRT engine for NVIDIA GPUs
+    if args.trt_fp16 and not build_trt_engine(output_dir, stem):
+        return 1
+    
+    model_path = output_dir / f"{stem}.onnx"
+    model_files = [model_path, output_dir / f"{stem}.onnx.json"]
+    if args.quantize:
+        model_files += [output_dir / f"{stem}.int8.onnx", output_dir / f"{stem}.int8.onnx.json"]
+    if args.trt_fp16:
+        model_files.append(output_dir / f"{stem}.fp16.plan")
+    
     # Generate test audio if requested
     if not args.no_test:
-        model_path = output_dir / f"en_US-{args.name}.onnx"
-        test_wav = output_dir / f"test_{args.name}.wav"
-        
-        # Collect synthesis parameters
-        synthesis_params = {}
-        if args.length_scale is not None:
-            synthesis_params['length_scale'] = args.length_scale
-        if args.noise_scale is not None:
-            synthesis_params['noise_scale'] = args.noise_scale
-        if args.noise_w is not None:
-            synthesis_params['noise_w'] = args.noise_w
+        test_wavs = test_wav_paths(output_dir, args.name, len(args.text))
         
-        if not generate_test_audio(model_path, args.text, test_wav, **synthesis_params):
+        if not generate_test_audios(model_path, list(zip(args.text, test_wavs)),
+                                    **synthesis_params):
             return 1
         
         print(f"\n{'=' * 70}")
         print("SUCCESS! Model exported and tested.")
         print(f"{'=' * 70}")
         print(f"\nModel files:")
-        print(f"  {output_dir / f'en_US-{args.name}.onnx'}")
-        print(f"  {output_dir / f'en_US-{args.name}.onnx.json'}")
+        for model_file in model_files:
+            print(f"  {model_file}")
         print(f"\nTest audio:")
-        print(f"  {test_wav}")
+        for test_wav in test_wavs:
+            print(f"  {test_wav}")
         print(f"\nTo use this model:")
-        print(f"  echo 'Your text here' | piper --model {output_dir / f'en_US-{args.name}.onnx'} --output_file output.wav")
+        print(f"  echo 'Your text here' | piper --model {model_path} --output_file output.wav")
     else:
         print(f"\n{'=' * 70}")
         print("SUCCESS! Model exported (audio test skipped).")
         print(f"{'=' * 70}")
         print(f"\nModel files:")
-        print(f"  {output_dir / f'en_US-{args.name}.onnx'}")
-        print(f"  {output_dir / f'en_US-{args.name}.onnx.json'}")
+        for model_file in model_files:
+            print(f"  {model_file}")
     
     return 0
 
@@ -4,14 +4,19 @@
 # Usage: python recording.py [--sentences FILENAME]
 
 import os
+import math
 import sys
 import argparse
+import bisect
+import csv
+import functools
 import tkinter as tk
 from tkinter import messagebox, ttk
 import sounddevice as sd
 import soundfile as sf
 import numpy as np
 import threading
+import collections
 
 # -----------------------------
 # Configuration
@@ -25,6 +30,9 @@ LEVEL_THRESHOLD_HIGH = 0.9
 TARGET_RMS = 0.15  # Target RMS for normalization
 SILENCE_THRESHOLD = 0.01  # Threshold for silence detection
 SILENCE_DURATION = 0.1  # Seconds of silence to trim
+METER_UPDATE_MS = 66  # Level meter refresh interval (~15 Hz)
+MAX_RECORD_SECONDS = 60  # Initial capture buffer size, grown if a take is longer
+PRE_ROLL_SECONDS = 0.1  # Audio kept before speech starts (trim_silence keeps 50ms of it)
 
 # -----------------------------
 # Default Sentences (35 optimized)
@@ -118,46 +126,79 @@ def create_default_sentences_file(filename):
 # -----------------------------
 # Audio Processing Functions
 # -----------------------------
+def compute_rms(audio):
+    """RMS level of audio, without materializing a squared copy"""
+    if audio.size == 0:
+        return 0.0
+    return math.sqrt(float(np.vdot(audio, audio)) / audio.size)
+
 def normalize_audio(audio, target_rms=TARGET_RMS):
-    """Normalize audio to target RMS level"""
-    current_rms = np.sqrt(np.mean(audio ** 2))
+    """Normalize audio to target RMS level (scales audio in place)"""
+    current_rms = compute_rms(audio)
     if current_rms > 0:
         scaling_factor = target_rms / current_rms
         # Prevent clipping
-        audio = audio * scaling_factor
-        max_val = np.max(np.abs(audio))
+        max_val = float(np.max(np.abs(audio))) * scaling_factor
         if max_val > 0.95:
-            audio = audio * (0.95 / max_val)
+            scaling_factor *= 0.95 / max_val
+        np.multiply(audio, scaling_factor, out=audio)
     return audio
 
+# Work arrays reused across calls, only touched by one save at a time
+_scratch_buffers = {}
+
+def scratch_buffer(name, size, dtype):
+    """Return a reusable work array of the given size, grown on demand"""
+    buf = _scratch_buffers.get(name)
+    if buf is None or len(buf) < size or buf.dtype != dtype:
+        buf = np.empty(size, dtype=dtype)
+        _scratch_buffers[name] = buf
+    return buf[:size]
+
+def moving_average(x, window):
+    """Boxcar moving average, same result as np.convolve(x, ones/window, mode='same')
+    
+    Uses a cumulative sum so the cost is O(n) instead of O(n * window).
+    """
+    # Zero padding matches the implicit padding np.convolve uses at the edges
+    left = window // 2
+    padded = scratch_buffer('padded', len(x) + window - 1, np.float32)
+    padded[:left] = 0
+    padded[left:left + len(x)] = x
+    padded[left + len(x):] = 0
+    # Accumulate in float64, a float32 running sum drifts over long takes
+    csum = scratch_buffer('csum', len(padded) + 1, np.float64)
+    csum[0] = 0
+    np.cumsum(padded, dtype=np.float64, out=csum[1:])
+    return (csum[window:] - csum[:-window]) / window
+
 def trim_silence(audio, sample_rate, threshold=SILENCE_THRESHOLD, duration=SILENCE_DURATION):
     """Trim silence from beginning and end of audio"""
     # Calculate frames for minimum duration
     min_frames = int(duration * sample_rate)
     
     # Find non-silent regions
-    abs_audio = np.abs(audio)
+    abs_audio = np.abs(audio, out=scratch_buffer('abs', len(audio), np.float32))
     
     # Smooth with a moving average to avoid cutting on brief dips
     window = min(512, len(abs_audio) // 10)
     if window > 1:
-        smoothed = np.convolve(abs_audio, np.ones(window)/window, mode='same')
+        smoothed = moving_average(abs_audio, window)
     else:
         smoothed = abs_audio
     
+    # Nothing above the threshold, keep everything
+    above = smoothed > threshold
+    if not above.any():
+        return audio
+    
     # Find start
-    start_idx = 0
-    for i in range(len(smoothed)):
-        if smoothed[i] > threshold:
-            start_idx = max(0, i - int(0.05 * sample_rate))  # Keep 50ms before speech
-            break
+    first = int(above.argmax())
+    start_idx = max(0, first - int(0.05 * sample_rate))  # Keep 50ms before speech
     
     # Find end
-    end_idx = len(smoothed)
-    for i in range(len(smoothed) - 1, -1, -1):
-        if smoothed[i] > threshold:
-            end_idx = min(len(smoothed), i + int(0.05 * sample_rate))  # Keep 50ms after speech
-            break
+    last = len(smoothed) - 1 - int(above[::-1].argmax())
+    end_idx = min(len(smoothed), last + int(0.05 * sample_rate))  # Keep 50ms after speech
     
     # Ensure we don't trim too much
     if end_idx - start_idx < min_frames:
@@ -165,6 +206,20 @@ def trim_silence(audio, sample_rate, threshold=SILENCE_THRESHOLD, duration=SILEN
     
     return audio[start_idx:end_idx]
 
+@functools.lru_cache(maxsize=32)
+def load_wav(filepath, mtime_ns):
+    """Read a WAV file and its level stats, cached until the file changes
+    
+    Returns (data, sample_rate, (min, max, rms)).
+    """
+    data, sr = sf.read(filepath, dtype='float32', always_2d=False)
+    stats = (np.min(data), np.max(data), compute_rms(data))
+    return data, sr, stats
+
+def load_wav_cached(filepath):
+    """load_wav keyed on the file's current modification time"""
+    return load_wav(filepath, os.stat(filepath).st_mtime_ns)
+
 # -----------------------------
 # Recorder App
 # -----------------------------
@@ -174,8 +229,23 @@ class RecorderApp:
         self.sentences = sentences
         self.index = 0
         self.recording = False
-        self.audio_data = []
+        self.processing = False
+        self.record_buf = None
+        self.record_len = 0
+        self.voiced_len = 0
+        self.speech_started = False
+        # Energy of the whole take, silence included, for the level check
+        self.take_len = 0
+        self.take_sq_sum = 0.0
+        # Input blocks from before speech starts; sized in samples because
+        # PortAudio picks (and may vary) the block size
+        self.pre_roll = collections.deque()
+        self.pre_roll_len = 0
         self.stream = None
+        
+        # Last 0.1 seconds of input for the level meter
+        self.meter_ring = np.zeros(SAMPLE_RATE // 10, dtype=np.float32)
+        self.meter_pos = 0
 
         # Ensure wav directory exists
         os.makedirs(WAV_DIR, exist_ok=True)
@@ -308,8 +378,7 @@ class RecorderApp:
         self.next_sentence()
 
     def is_recorded(self, idx):
-        filename = f"{idx + 1:03d}.wav"
-        return filename in [entry[0] for entry in self.metadata]
+        return f"{idx + 1:03d}.wav" in self.recorded_filenames
 
     # -----------------------------
     # Recording
@@ -325,15 +394,28 @@ class RecorderApp:
             messagebox.showinfo("Complete", "All sentences have been recorded!")
             return
         
+        # Wait for the previous take to finish saving
+        if self.processing:
+            return
+        
         self.recording = True
-        self.audio_data = []
+        self.record_buf = np.empty(int(MAX_RECORD_SECONDS * SAMPLE_RATE), dtype=np.float32)
+        self.record_len = 0
+        self.voiced_len = 0
+        self.speech_started = False
+        self.take_len = 0
+        self.take_sq_sum = 0.0
+        self.pre_roll.clear()
+        self.pre_roll_len = 0
+        self.meter_ring.fill(0)
+        self.meter_pos = 0
         self.status_var.set("🔴 RECORDING... (Press Space to stop)")
         self.sentence_label.config(bg="lightcoral")
         self.start_btn.config(relief=tk.SUNKEN)
         
         try:
             self.stream = sd.InputStream(channels=1, samplerate=SAMPLE_RATE, 
-                                        callback=self.audio_callback)
+                                        dtype='float32', callback=self.audio_callback)
             self.stream.start()
             self.update_meter()
         except Exception as e:
@@ -351,18 +433,21 @@ class RecorderApp:
             self.stream.stop()
             self.stream.close()
         
-        if not self.audio_data:
+        if not self.take_len:
             self.status_var.set("No audio recorded!")
             self.update_sentence_display()
             return
         
-        # Convert to numpy array
-        audio = np.concatenate(self.audio_data, axis=0).flatten()
+        # Captured samples up to shortly after the last speech, no copy needed
+        end = min(self.record_len, self.voiced_len + int(SILENCE_DURATION * SAMPLE_RATE))
+        audio = self.record_buf[:end]
         
-        # Check RMS level
-        rms = np.sqrt(np.mean(audio ** 2))
+        # Check RMS level over the whole take, like before silence was
+        # dropped during capture, so the thresholds keep their meaning
+        rms = math.sqrt(self.take_sq_sum / self.take_len)
         
-        if rms < LEVEL_THRESHOLD_LOW:
+        # No speech detected at all is too quiet as well
+        if not self.speech_started or rms < LEVEL_THRESHOLD_LOW:
             messagebox.showwarning("Warning", 
                 f"Audio level too low (RMS: {rms:.3f})!\nPlease speak louder and re-record.")
             self.status_var.set("Recording failed - too quiet")
@@ -373,92 +458,188 @@ class RecorderApp:
             self.status_var.set("Recording failed - too loud")
             self.update_sentence_display()
         else:
-            try:
-                # Trim silence
-                audio = trim_silence(audio, SAMPLE_RATE)
-                
-                # Normalize
-                audio = normalize_audio(audio)
-                
-                # Save WAV with 3-digit numbering
-                filename = f"{self.index + 1:03d}.wav"
-                filepath = os.path.join(WAV_DIR, filename)
-                sf.write(filepath, audio, SAMPLE_RATE)
-                
-                # Save metadata
-                self.save_metadata(filename, self.sentences[self.index])
-                
-                self.status_var.set(f"✓ Saved {filename} (RMS: {rms:.3f})")
-                self.next_sentence()
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to save audio: {e}")
-                self.status_var.set("Error saving audio")
-                self.update_sentence_display()
+            # Save WAV with 3-digit numbering
+            filename = f"{self.index + 1:03d}.wav"
+            sentence = self.sentences[self.index]
+            
+            # Trim, normalize and write in the background so the GUI stays responsive
+            self.processing = True
+            threading.Thread(target=self.process_audio,
+                             args=(audio, filename, sentence, rms),
+                             daemon=True).start()
         
         # Reset LED
         self.led_canvas.itemconfig(self.led_circle, fill="gray30", outline="gray50")
         self.level_status_var.set("Ready")
 
+    def process_audio(self, audio, filename, sentence, rms):
+        """Post-process and save a take (runs in a worker thread)"""
+        try:
+            # Trim silence
+            audio = trim_silence(audio, SAMPLE_RATE)
+            
+            # Normalize
+            audio = normalize_audio(audio)
+            
+            filepath = os.path.join(WAV_DIR, filename)
+            sf.write(filepath, audio, SAMPLE_RATE, subtype='PCM_16')
+        except Exception as e:
+            self.master.after(0, lambda error=e: self.on_save_failed(error))
+            return
+        self.master.after(0, lambda: self.on_saved(filename, sentence, rms))
+
+    def on_saved(self, filename, sentence, rms):
+        """Record a saved take and move on (runs on the Tk thread)"""
+        self.processing = False
+        try:
+            # Save metadata
+            self.save_metadata(filename, sentence)
+        except Exception as e:
+            self.on_save_failed(e)
+            return
+        
+        self.status_var.set(f"✓ Saved {filename} (RMS: {rms:.3f})")
+        self.next_sentence()
+
+    def on_save_failed(self, error):
+        """Report a failed save (runs on the Tk thread)"""
+        self.processing = False
+        messagebox.showerror("Error", f"Failed to save audio: {error}")
+        self.status_var.set("Error saving audio")
+        self.update_sentence_display()
+
     def audio_callback(self, indata, frames, time, status):
         if self.recording:
-            self.audio_data.append(indata.copy())
+            block = indata[:, 0]
+            self.write_meter_ring(block)
+            
+            # Leading silence is not stored, only a short pre-roll before speech
+            block_rms = compute_rms(block)
+            self.take_len += len(block)
+            self.take_sq_sum += block_rms * block_rms * len(block)
+            voiced = block_rms > SILENCE_THRESHOLD
+            if not self.speech_started:
+                if not voiced:
+                    self.keep_pre_roll(block)
+                    return
+                self.speech_started = True
+                for pre_block in self.pre_roll:
+                    self.append_block(pre_block)
+                self.pre_roll.clear()
+                self.pre_roll_len = 0
+            
+            self.append_block(block)
+            if voiced:
+                self.voiced_len = self.record_len
+
+    def keep_pre_roll(self, block):
+        """Remember a silent block, keeping at least PRE_ROLL_SECONDS of audio"""
+        self.pre_roll.append(block.copy())
+        self.pre_roll_len += len(block)
+        min_len = int(PRE_ROLL_SECONDS * SAMPLE_RATE)
+        while self.pre_roll_len - len(self.pre_roll[0]) >= min_len:
+            self.pre_roll_len -= len(self.pre_roll.popleft())
+
+    def append_block(self, block):
+        """Append samples to the capture buffer"""
+        n = len(block)
+        end = self.record_len + n
+        if end > len(self.record_buf):
+            # Longer than expected, double the buffer
+            grown = np.empty(max(end, 2 * len(self.record_buf)), dtype=np.float32)
+            grown[:self.record_len] = self.record_buf[:self.record_len]
+            self.record_buf = grown
+        self.record_buf[self.record_len:end] = block
+        self.record_len = end
+
+    def write_meter_ring(self, block):
+        """Copy the newest samples into the meter ring buffer"""
+        ring = self.meter_ring
+        size = ring.size
+        if len(block) >= size:
+            ring[:] = block[-size:]
+            self.meter_pos = 0
+            return
+        
+        n = len(block)
+        end = self.meter_pos + n
+        if end <= size:
+            ring[self.meter_pos:end] = block
+        else:
+            # Wrap around the end of the buffer
+            split = size - self.meter_pos
+            ring[self.meter_pos:] = block[:split]
+            ring[:n - split] = block[split:]
+        self.meter_pos = end % size
 
     def update_meter(self):
         if self.recording:
-            if self.audio_data:
-                audio = np.concatenate(self.audio_data, axis=0)
-                # Use peak level instead of RMS for more responsive meter
-                level = np.max(np.abs(audio[-SAMPLE_RATE//10:]))  # Last 0.1 seconds
-                
-                # Update single LED with color based on level
-                if level < 0.05:
-                    # Too quiet
-                    color = "gray40"
-                    outline = "gray50"
-                    status = "Too quiet"
-                elif level < 0.7:
-                    # Good level - green
-                    color = "lime"
-                    outline = "green"
-                    status = "Good"
-                elif level < 0.9:
-                    # Getting loud - yellow
-                    color = "yellow"
-                    outline = "orange"
-                    status = "Loud"
-                else:
-                    # Too loud/clipping - red
-                    color = "red"
-                    outline = "darkred"
-                    status = "Clipping!"
-                
-                self.led_canvas.itemconfig(self.led_circle, fill=color, outline=outline)
-                self.level_status_var.set(status)
-            self.master.after(50, self.update_meter)
+            # Use peak level instead of RMS for more responsive meter
+            # Peak magnitude from max/min, no |x| temporary needed
+            level = max(self.meter_ring.max(), -self.meter_ring.min())  # Last 0.1 seconds
+            
+            # Update single LED with color based on level
+            if level < 0.05:
+                # Too quiet
+                color = "gray40"
+                outline = "gray50"
+                status = "Too quiet"
+            elif level < 0.7:
+                # Good level - green
+                color = "lime"
+                outline = "green"
+                status = "Good"
+            elif level < 0.9:
+                # Getting loud - yellow
+                color = "yellow"
+                outline = "orange"
+                status = "Loud"
+            else:
+                # Too loud/clipping - red
+                color = "red"
+                outline = "darkred"
+                status = "Clipping!"
+            
+            self.led_canvas.itemconfig(self.led_circle, fill=color, outline=outline)
+            self.level_status_var.set(status)
+            self.master.after(METER_UPDATE_MS, self.update_meter)
 
     # -----------------------------
     # Metadata
     # -----------------------------
     def save_metadata(self, filename, sentence):
-        # Update metadata list
-        self.metadata.append([filename, sentence])
-        
-        # Rewrite entire metadata file sorted by filename
-        with open(METADATA_FILE, 'w', encoding='utf-8') as f:
-            for entry in sorted(self.metadata, key=lambda x: x[0]):
-                f.write(f"{entry[0]}|{entry[1]}\n")
+        # Update metadata list, kept sorted by filename
+        bisect.insort(self.metadata, [filename, sentence])
+        self.recorded_filenames.add(filename)
+        
+        # Append only the new line, the file is re-sorted on the next startup if needed.
+        # A hand-edited file may lack its final newline; don't glue onto that row.
+        prefix = ""
+        if os.path.exists(METADATA_FILE) and os.path.getsize(METADATA_FILE) > 0:
+            with open(METADATA_FILE, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    prefix = "\n"
+        with open(METADATA_FILE, 'a', encoding='utf-8', buffering=1) as f:
+            f.write(f"{prefix}{filename}|{sentence}\n")
 
     def load_metadata(self):
         self.metadata = []
         if os.path.exists(METADATA_FILE):
-            with open(METADATA_FILE, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    parts = line.split('|', 1)
-                    if len(parts) == 2:
-                        self.metadata.append([parts[0], parts[1]])
+            with open(METADATA_FILE, 'r', encoding='utf-8', newline='') as f:
+                # QUOTE_NONE keeps quote characters in sentences as they are
+                for row in csv.reader(f, delimiter='|', quoting=csv.QUOTE_NONE):
+                    if len(row) >= 2:
+                        # A '|' inside the sentence splits it into extra fields
+                        self.metadata.append([row[0].strip(), '|'.join(row[1:]).strip()])
+        self.recorded_filenames = {entry[0] for entry in self.metadata}
+        
+        # Re-recording an earlier sentence appends out of order, sort the file once here
+        if any(self.metadata[i][0] > self.metadata[i + 1][0] for i in range(len(self.metadata) - 1)):
+            self.metadata.sort(key=lambda x: x[0])
+            with open(METADATA_FILE, 'w', encoding='utf-8') as f:
+                for entry in self.metadata:
+                    f.write(f"{entry[0]}|{entry[1]}\n")
 
     # -----------------------------
     # Review
@@ -475,7 +656,8 @@ class ReviewWindow:
         self.top.title("Review Recordings")
         self.top.geometry("700x350")
         self.app = app
-        self.metadata = app.metadata.copy()
+        # Shared with the recorder so both windows always see the same entries
+        self.metadata = app.metadata
         self.index = 0
 
         # Sentence label
@@ -539,10 +721,7 @@ class ReviewWindow:
             filepath = os.path.join(WAV_DIR, filename)
             if os.path.exists(filepath):
                 try:
-                    data, sr = sf.read(filepath)
-                    min_lvl = np.min(data)
-                    max_lvl = np.max(data)
-                    rms_lvl = np.sqrt(np.mean(data**2))
+                    data, sr, (min_lvl, max_lvl, rms_lvl) = load_wav_cached(filepath)
                     duration = len(data) / sr
                     self.level_label.config(
                         text=f"Duration: {duration:.2f}s | Min: {min_lvl:.3f} | Max: {max_lvl:.3f} | RMS: {rms_lvl:.3f}"
@@ -563,20 +742,24 @@ class ReviewWindow:
         width = 600
         height = 80
         
-        # Downsample for display
-        step = max(1, len(data) // width)
-        display_data = data[::step]
+        # Downsample for display, keeping the peak of each bin so transients show up
+        n_bins = min(width, len(data))
+        if n_bins == 0:
+            return
+        k = len(data) // n_bins
+        peaks = np.abs(data[:n_bins * k]).reshape(n_bins, k).max(axis=1)
         
         # Normalize to canvas height
-        if len(display_data) > 0:
-            max_val = max(np.max(np.abs(display_data)), 0.01)
-            display_data = display_data / max_val * (height / 2 - 5)
+        max_val = max(peaks.max(), 0.01)
+        peaks = peaks / max_val * (height / 2 - 5)
         
-        # Draw waveform
+        # Draw the envelope mirrored around the center in a single canvas call
         center = height / 2
-        for i, val in enumerate(display_data):
-            x = i * width / len(display_data)
-            self.wave_canvas.create_line(x, center, x, center - val, fill="lime", width=1)
+        xs = np.arange(n_bins) * (width / n_bins)
+        top = np.column_stack((xs, center - peaks))
+        bottom = np.column_stack((xs, center + peaks))[::-1]
+        points = np.concatenate((top, bottom)).ravel().tolist()
+        self.wave_canvas.create_polygon(*points, fill="lime", outline="lime", width=1)
 
     def play_audio(self):
         if self.index < len(self.metadata):
@@ -584,7 +767,7 @@ class ReviewWindow:
             filepath = os.path.join(WAV_DIR, filename)
             if os.path.exists(filepath):
                 try:
-                    data, sr = sf.read(filepath)
+                    data, sr, _ = load_wav_cached(filepath)
                     sd.play(data, sr)
                     sd.wait()
                 except Exception as e:
@@ -615,14 +798,15 @@ class ReviewWindow:
                     except Exception as e:
                         messagebox.showerror("Error", f"Failed to delete file: {e}")
                         return
+                    load_wav.cache_clear()
                 
                 # Remove from metadata
                 self.metadata.pop(self.index)
-                self.app.metadata = self.metadata.copy()
+                self.app.recorded_filenames.discard(filename)
                 
-                # Rewrite metadata file
+                # Rewrite metadata file (the list is already sorted)
                 with open(METADATA_FILE, 'w', encoding='utf-8') as f:
-                    for entry in sorted(self.metadata, key=lambda x: x[0]):
+                    for entry in self.metadata:
                         f.write(f"{entry[0]}|{entry[1]}\n")
                 
                 # Stay at same index (which now shows next item)
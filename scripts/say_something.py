@@ -1,18 +1,80 @@
+import argparse
+import json
 import wave
 
 from piper import PiperVoice
 from piper import SynthesisConfig
 
-voice = PiperVoice.load("my-model/en_US-W7IY.onnx")
+MODEL_PATH = "my-model/en_US-W7IY.onnx"
 
-syn_config = SynthesisConfig(
-    volume=0.85,  # half as loud
-    length_scale=1,  # twice as slow
-    noise_scale=0.667,  # more audio variation
-    noise_w_scale=0.9,  # more speaking variation
-    normalize_audio=True, # use raw audio from voice
-)
+# onnxruntime provider for each --device choice
+DEVICE_PROVIDERS = {
+    "cuda": "CUDAExecutionProvider",
+    "directml": "DmlExecutionProvider",
+}
 
+# Loaded once on first use so repeated calls (or imports from a batch
+# script) don't re-parse the ONNX graph for every sentence.
+_voice = None
+_syn_config = None
 
-with wave.open("test.wav", "wb") as wav_file:
-    voice.synthesize_wav("Juliet got an x-ray of her broken leg!", wav_file,syn_config=syn_config)
+
+def load_voice(model_path, device="cpu"):
+    """Load a PiperVoice on the requested device, falling back to CPU"""
+    if device == "cpu":
+        return PiperVoice.load(model_path)
+
+    import onnxruntime
+
+    provider = DEVICE_PROVIDERS[device]
+    if provider not in onnxruntime.get_available_providers():
+        print(f"Warning: {provider} not available, using CPU")
+        return PiperVoice.load(model_path)
+
+    if device == "cuda":
+        return PiperVoice.load(model_path, use_cuda=True)
+
+    # PiperVoice.load only knows about CUDA, so build the session ourselves
+    from piper.config import PiperConfig
+
+    with open(f"{model_path}.json", "r", encoding="utf-8") as config_file:
+        config = PiperConfig.from_dict(json.load(config_file))
+    session = onnxruntime.InferenceSession(
+        model_path,
+        sess_options=onnxruntime.SessionOptions(),
+        providers=[provider, "CPUExecutionProvider"],
+    )
+    return PiperVoice(session=session, config=config)
+
+
+def get_voice(device="cpu"):
+    global _voice, _syn_config
+    if _voice is None:
+        _voice = load_voice(MODEL_PATH, device)
+        _syn_config = SynthesisConfig(
+            volume=0.85,  # half as loud
+            length_scale=1,  # twice as slow
+            noise_scale=0.667,  # more audio variation
+            noise_w_scale=0.9,  # more speaking variation
+            normalize_audio=True, # use raw audio from voice
+        )
+    return _voice, _syn_config
+
+
+def synthesize_batch(items, device="cpu"):
+    """Write each (text, wav_path) pair using one voice and one config."""
+    voice, syn_config = get_voice(device)
+    for text, wav_path in items:
+        with wave.open(wav_path, "wb") as wav_file:
+            voice.synthesize_wav(text, wav_file, syn_config=syn_config)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create a test wav file")
+    parser.add_argument("--device", choices=["cpu", *DEVICE_PROVIDERS], default="cpu",
+                        help="onnxruntime device for synthesis (default: cpu)")
+    args = parser.parse_args()
+
+    synthesize_batch([
+        ("Juliet got an x-ray of her broken leg!", "test.wav"),
+    ], device=args.device)